@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
 import logging
+import orjson
 from datetime import datetime
 from app.models.state import AgentState
 from app.core.exceptions import AgentException
@@ -22,7 +23,7 @@ class BaseAgent(ABC):
     def pre_process(self, state: AgentState) -> AgentState:
         """Pre-processing hook"""
         self._execution_count += 1
-        state["agent_path"].append(self.name)
+        state.setdefault("agent_path", []).append(self.name)
         self.logger.info(f"Starting {self.name} processing")
         return state
     
@@ -43,6 +44,32 @@ class BaseAgent(ABC):
             state["errors"].append(f"{self.name}: {str(e)}")
             raise AgentException(f"Agent {self.name} failed: {str(e)}")
     
+    def _project_data(self, data: Optional[Dict[str, Any]]) -> str:
+        """Project processed data onto the compact JSON subset embedded in prompts"""
+        if not data:
+            return "{}"
+        
+        projection = {
+            "entities": data.get("entities", [])[:10],
+            "data_points": data.get("data_points", {}),
+            "analysis_summary": self._summarize_analysis(data.get("analysis", {}), "summary")
+        }
+        
+        # Results of the numerical and text analysis calls, when the data processor made them
+        for key in ("numerical_analysis", "text_analysis"):
+            if data.get(key):
+                projection[key] = self._summarize_analysis(data[key], "analysis")
+        
+        return orjson.dumps(projection, default=str).decode()
+    
+    @staticmethod
+    def _summarize_analysis(analysis: Any, field: str, limit: int = 500) -> str:
+        """Reduce an analysis section to a length-capped string"""
+        summary = analysis.get(field) if isinstance(analysis, dict) else None
+        if not summary:
+            summary = analysis if isinstance(analysis, str) else orjson.dumps(analysis, default=str).decode()
+        return str(summary)[:limit]
+    
     @property
     def stats(self) -> Dict[str, Any]:
         """Get agent statistics"""
@@ -1,12 +1,47 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, Optional
 from app.agents.base import BaseAgent
 from app.models.state import AgentState
-from app.services.llm_service import get_llm_service
-from app.core.exceptions import CommunicationException
+from app.services.llm_service import get_llm_service, parse_json_response
+from app.core.exceptions import CommunicationException, LLMException
+
+COMPOSE_SYSTEM_PROMPT = """
+Prepare the final response for the user's query using the data and decision provided.
+
+1. Choose the best communication style from: technical, executive, casual, detailed.
+   Consider the audience and purpose.
+2. Write the response in that style. Structure it to be clear and actionable. Include:
+   - Direct answer to the query
+   - Supporting information
+   - Key recommendations
+   - Next steps if applicable
+3. Generate 3-5 specific, actionable and valuable insights.
+
+Respond only with JSON in this format:
+{"style": "<style name>", "message": "<response text>", "insights": ["<insight>", "..."]}
+"""
+
+# Also used for the plain-text fallback when the composed JSON cannot be parsed
+STREAM_SYSTEM_PROMPT = """
+Create a detailed response for the user's query using the data and decision provided.
+
+Structure the response to be clear and actionable.
+Include:
+1. Direct answer to the query
+2. Supporting information
+3. Key recommendations
+4. Next steps if applicable
+"""
 
 class CommunicatorAgent(BaseAgent):
     """Agent responsible for formatting and communicating results"""
     
+    # Weights for the overall confidence score
+    confidence_weights = (
+        ("data_processing", 0.3),
+        ("decision_making", 0.4),
+        ("communication", 0.3)
+    )
+    
     def __init__(self):
         super().__init__(
             name="Communicator",
@@ -14,94 +49,141 @@ class CommunicatorAgent(BaseAgent):
         )
         self.llm = get_llm_service()
         self.output_formats = ["summary", "detailed", "technical", "executive"]
+        self.communication_styles = ["technical", "executive", "casual", "detailed"]
     
     async def process(self, state: AgentState) -> AgentState:
         """Format and prepare the final communication"""
         try:
-            # Determine appropriate communication style
-            style = await self._determine_communication_style(state)
+            # Choose style, write the message and derive insights in one call
+            composed = await self._compose_response(state)
+            style = composed["style"]
+            message = composed["message"]
+            insights = composed["insights"]
             
-            # Prepare the message based on all collected information
-            message = await self._prepare_message(state, style)
+            state["confidence_scores"]["communication"] = 0.9
+            state["metadata"]["overall_confidence"] = self._calculate_overall_confidence(state)
             
             # Add visualizations or formatting if needed
             formatted_output = await self._format_output(message, state)
             
-            # Generate actionable insights
-            insights = await self._generate_insights(state)
-            
             state["final_output"] = formatted_output
             state["metadata"]["communication_style"] = style
             state["metadata"]["insights"] = insights
-            state["confidence_scores"]["communication"] = 0.9
             
             return state
             
         except Exception as e:
             raise CommunicationException(f"Communication formatting failed: {str(e)}")
     
-    async def _determine_communication_style(self, state: AgentState) -> str:
-        """Determine the appropriate communication style"""
-        query = state["query"]
-        task_type = state["task_type"]
-        
-        prompt = f"""
-        Determine the best communication style for this response:
-        Query: {query}
-        Task Type: {task_type}
-        
-        Choose from: technical, executive, casual, detailed
-        Consider the audience and purpose.
-        
-        Respond with just the style name.
-        """
-        
-        response = await self.llm.ainvoke(prompt)
-        style = response.content.strip().lower()
-        
-        return style if style in ["technical", "executive", "casual", "detailed"] else "detailed"
+    async def aprocess_stream(self, state: AgentState) -> AsyncIterator[str]:
+        """Stream the formatted final communication as the message is generated"""
+        state = self.pre_process(state)
+        try:
+            state["confidence_scores"]["communication"] = 0.9
+            state["metadata"]["overall_confidence"] = self._calculate_overall_confidence(state)
+            
+            header = self._format_header(state)
+            yield header
+            
+            message_parts = []
+            async for chunk in self.llm.astream(self._build_context_prompt(state), system_prompt=STREAM_SYSTEM_PROMPT):
+                if chunk.content:
+                    message_parts.append(chunk.content)
+                    yield chunk.content
+            
+            footer = self._format_footer(state)
+            yield footer
+            
+            state["final_output"] = header + "".join(message_parts) + footer
+            state["metadata"]["communication_style"] = "detailed"
+            self.post_process(state)
+            
+        except Exception as e:
+            self.logger.error(f"Error in {self.name}: {str(e)}")
+            state["errors"].append(f"{self.name}: {str(e)}")
+            raise CommunicationException(f"Communication streaming failed: {str(e)}")
     
-    async def _prepare_message(self, state: AgentState, style: str) -> str:
-        """Prepare the main message content"""
-        processed_data = state.get("processed_data", {})
-        decisions = state.get("decisions", [])
+    def _build_context_prompt(self, state: AgentState) -> str:
+        """Build the per-request part of the communication prompt"""
         final_decision = state.get("metadata", {}).get("final_decision", {})
         
-        prompt = f"""
-        Create a {style} response for this query:
+        return f"""
         Original Query: {state['query']}
+        Task Type: {state['task_type']}
         
-        Key Data Points: {processed_data}
+        Key Data Points: {self._project_data(state.get("processed_data"))}
         Decision Made: {final_decision.get('selected_option', {}).get('description', 'No decision made')}
         Reasoning: {final_decision.get('reasoning', 'No reasoning provided')}
-        
-        Structure the response to be clear, actionable, and appropriate for the {style} style.
-        Include:
-        1. Direct answer to the query
-        2. Supporting information
-        3. Key recommendations
-        4. Next steps if applicable
         """
+    
+    async def _compose_response(self, state: AgentState) -> Dict[str, Any]:
+        """Determine style, prepare the message and generate insights in a single LLM call"""
+        prompt = self._build_context_prompt(state)
+        try:
+            response = await self.llm.ainvoke(
+                prompt,
+                system_prompt=COMPOSE_SYSTEM_PROMPT,
+                response_format={"type": "json_object"}
+            )
+            composed = self._parse_composed_response(response.content)
+        except LLMException:
+            # JSON mode rejects generations that are not valid JSON (json_validate_failed)
+            composed = None
+        if composed is not None:
+            return composed
+        
+        # Never show the raw JSON to the user; ask for the message as plain text instead
+        self.logger.warning("Could not get a composed response, falling back to a plain message")
+        response = await self.llm.ainvoke(prompt, system_prompt=STREAM_SYSTEM_PROMPT)
+        return {"style": "detailed", "message": response.content, "insights": []}
+    
+    def _parse_composed_response(self, text: str) -> Optional[Dict[str, Any]]:
+        """Parse the combined style/message/insights JSON returned by the LLM
         
-        response = await self.llm.ainvoke(prompt)
-        return response.content
+        Returns None if the text does not contain a usable message.
+        """
+        parsed = parse_json_response(text)
+        if not isinstance(parsed, dict) or not parsed.get("message"):
+            return None
+        
+        style = str(parsed.get("style", "")).strip().lower()
+        message = parsed["message"]
+        insights = parsed.get("insights") or []
+        if not isinstance(insights, list):
+            insights = [insights]
+        
+        return {
+            "style": style if style in self.communication_styles else "detailed",
+            "message": str(message),
+            "insights": [str(insight).strip() for insight in insights if str(insight).strip()][:5]  # Limit to 5 insights
+        }
     
     async def _format_output(self, message: str, state: AgentState) -> str:
         """Format the output with appropriate structure"""
-        # Add metadata and structure
+        return self._format_header(state) + message + self._format_footer(state)
+    
+    def _format_header(self, state: AgentState) -> str:
+        """Format the part of the output that precedes the message"""
         output_parts = []
         
         # Header
         output_parts.append(f"## Response to: {state['query']}\n")
         
         # Confidence indicator
-        overall_confidence = self._calculate_overall_confidence(state)
+        overall_confidence = state["metadata"].get("overall_confidence")
+        if overall_confidence is None:
+            overall_confidence = self._calculate_overall_confidence(state)
         confidence_emoji = "🟢" if overall_confidence > 0.8 else "🟡" if overall_confidence > 0.6 else "🔴"
         output_parts.append(f"**Confidence Level**: {confidence_emoji} {overall_confidence:.0%}\n")
         
         # Main content
         output_parts.append("### Answer")
-        output_parts.append(message)
+        
+        return "\n".join(output_parts) + "\n"
+    
+    def _format_footer(self, state: AgentState) -> str:
+        """Format the part of the output that follows the message"""
+        output_parts = []
         
         # Add data summary if available
         if state.get("processed_data"):
@@ -120,28 +202,7 @@ class CommunicatorAgent(BaseAgent):
         output_parts.append(f"\n### Processing Path")
         output_parts.append(f"Agents involved: {' → '.join(state['agent_path'])}")
         
-        return "\n".join(output_parts)
-    
-    async def _generate_insights(self, state: AgentState) -> List[str]:
-        """Generate actionable insights from the processing"""
-        insights_prompt = f"""
-        Based on this processing, generate 3-5 actionable insights:
-        Query: {state['query']}
-        Data: {state.get('processed_data', {})}
-        Decision: {state.get('metadata', {}).get('final_decision', {})}
-        
-        Make insights specific, actionable, and valuable.
-        """
-        
-        response = await self.llm.ainvoke(insights_prompt)
-        
-        # Parse insights from response
-        insights = []
-        for line in response.content.split('\n'):
-            if line.strip() and (line.strip().startswith('-') or line.strip().startswith('•')):
-                insights.append(line.strip().lstrip('-•').strip())
-        
-        return insights[:5]  # Limit to 5 insights
+        return "\n" + "\n".join(output_parts)
     
     def _calculate_overall_confidence(self, state: AgentState) -> float:
         """Calculate overall confidence score"""
@@ -150,16 +211,10 @@ class CommunicatorAgent(BaseAgent):
             return 0.5
         
         # Weighted average of all confidence scores
-        weights = {
-            "data_processing": 0.3,
-            "decision_making": 0.4,
-            "communication": 0.3
-        }
-        
         total_weight = 0
         weighted_sum = 0
         
-        for key, weight in weights.items():
+        for key, weight in self.confidence_weights:
             if key in scores:
                 weighted_sum += scores[key] * weight
                 total_weight += weight
@@ -1,11 +1,50 @@
-import json
 import re
+from itertools import islice
 from typing import Dict, Any, List
 from app.agents.base import BaseAgent
 from app.models.state import AgentState
-from app.services.llm_service import get_llm_service
+from app.services.llm_service import get_llm_service, parse_json_response
 from app.core.exceptions import DataProcessingException
 
+_ENTITY_RE = re.compile(r'\b[A-Z][a-z]+\b')
+_NUM_RE = re.compile(r'\b\d+\.?\d*\b')
+_DATE_RE = re.compile(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b')
+_EMAIL_RE = re.compile(r'\b[\w.-]+@[\w.-]+\.\w+\b')
+_HAS_DIGIT_RE = re.compile(r'\d')
+_WORD_RE = re.compile(r'\S+')
+
+ANALYSIS_SYSTEM_PROMPT = """
+Analyze the user's query and extract key data points and requirements.
+
+Provide a structured analysis including:
+1. Data types needed
+2. Key entities mentioned
+3. Required transformations
+4. Output format requirements
+
+Respond in JSON format.
+"""
+
+NUMERICAL_SYSTEM_PROMPT = """
+Extract and analyze all numerical data from the user's text.
+
+Provide:
+1. All numbers found
+2. Their context
+3. Any calculations needed
+4. Statistical summary if applicable
+"""
+
+TEXT_SYSTEM_PROMPT = """
+Analyze and structure the user's text data.
+
+Provide:
+1. Main topics
+2. Key points
+3. Sentiment if applicable
+4. Summary
+"""
+
 class DataProcessorAgent(BaseAgent):
     """Agent responsible for data processing and transformation"""
     
@@ -22,24 +61,11 @@ class DataProcessorAgent(BaseAgent):
             query = state["query"]
             
             # Analyze the query type and extract data requirements
-            analysis_prompt = f"""
-            Analyze this query and extract key data points and requirements:
-            Query: {query}
+            response = await self.llm.ainvoke(f"Query: {query}", system_prompt=ANALYSIS_SYSTEM_PROMPT)
             
-            Provide a structured analysis including:
-            1. Data types needed
-            2. Key entities mentioned
-            3. Required transformations
-            4. Output format requirements
-            
-            Respond in JSON format.
-            """
-            
-            response = await self.llm.ainvoke(analysis_prompt)
-            
-            try:
-                analysis = json.loads(response.content)
-            except:
+            # Tolerates JSON wrapped in code fences or prose
+            analysis = parse_json_response(response.content)
+            if analysis is None:
                 # Fallback to text processing
                 analysis = self._extract_data_from_text(response.content)
             
@@ -73,25 +99,25 @@ class DataProcessorAgent(BaseAgent):
         # Simple entity extraction (can be enhanced with NLP libraries)
         entities = []
         # Extract capitalized words (simple approach)
-        entities.extend(re.findall(r'\b[A-Z][a-z]+\b', text))
-        return list(set(entities))
+        entities.extend(_ENTITY_RE.findall(text))
+        return list(dict.fromkeys(entities))
     
     def _extract_data_points(self, text: str) -> Dict[str, Any]:
         """Extract specific data points from text"""
         data_points = {}
         
         # Extract numbers
-        numbers = re.findall(r'\b\d+\.?\d*\b', text)
+        numbers = _NUM_RE.findall(text)
         if numbers:
             data_points["numbers"] = numbers
         
         # Extract dates (simple pattern)
-        dates = re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text)
+        dates = _DATE_RE.findall(text)
         if dates:
             data_points["dates"] = dates
         
         # Extract emails
-        emails = re.findall(r'\b[\w.-]+@[\w.-]+\.\w+\b', text)
+        emails = _EMAIL_RE.findall(text)
         if emails:
             data_points["emails"] = emails
         
@@ -99,42 +125,21 @@ class DataProcessorAgent(BaseAgent):
     
     def _contains_numerical_data(self, text: str) -> bool:
         """Check if text contains numerical data"""
-        return bool(re.search(r'\d+', text))
+        return bool(_HAS_DIGIT_RE.search(text))
     
     def _contains_text_data(self, text: str) -> bool:
         """Check if text contains substantial text data"""
-        return len(text.split()) > 5
+        # Stop scanning at the sixth word instead of splitting the whole text
+        return sum(1 for _ in islice(_WORD_RE.finditer(text), 6)) > 5
     
     async def _process_numerical_data(self, text: str) -> Dict[str, Any]:
         """Process numerical data in the text"""
-        prompt = f"""
-        Extract and analyze all numerical data from this text:
-        {text}
-        
-        Provide:
-        1. All numbers found
-        2. Their context
-        3. Any calculations needed
-        4. Statistical summary if applicable
-        """
-        
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(text, system_prompt=NUMERICAL_SYSTEM_PROMPT)
         return {"analysis": response.content}
     
     async def _process_text_data(self, text: str) -> Dict[str, Any]:
         """Process and structure text data"""
-        prompt = f"""
-        Analyze and structure this text data:
-        {text}
-        
-        Provide:
-        1. Main topics
-        2. Key points
-        3. Sentiment if applicable
-        4. Summary
-        """
-        
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(text, system_prompt=TEXT_SYSTEM_PROMPT)
         return {"analysis": response.content}
     
     def _extract_data_from_text(self, text: str) -> Dict[str, Any]:
@@ -1,10 +1,90 @@
-from typing import List, Dict, Any
+import asyncio
+import re
+from typing import List, Dict, Any, Optional
 from app.agents.base import BaseAgent
 from app.models.state import AgentState
-from app.services.llm_service import get_llm_service
+from app.services.llm_service import get_llm_service, parse_json_response
 from app.services.tools import web_search, calculate_metrics
 from app.core.exceptions import DecisionMakingException
 
+# Find scores in format "score: 0.8" or "8/10"
+_SCORE_PATTERNS = {
+    "feasibility": re.compile(r"feasibility.*?(\d*\.?\d+)"),
+    "impact": re.compile(r"impact.*?(\d*\.?\d+)"),
+    "risk": re.compile(r"risk.*?(\d*\.?\d+)")
+}
+
+# Weights for feasibility, impact and (inverse) risk when ranking options
+_FEASIBILITY_WEIGHT, _IMPACT_WEIGHT, _RISK_WEIGHT = 0.3, 0.4, 0.3
+
+# Matches "Option 1:", "**Option 2.**", "## Option 3)" headings at the start of a line
+_OPTION_SPLIT_RE = re.compile(r"(?im)^[\s*#]*option\s*\d+\s*[.):]?[\s*]*")
+
+BATCH_DECISION_SYSTEM_PROMPT = """
+Based on the user's query and data, generate 3 possible decision options,
+evaluate each of them and select the best one.
+
+For each option provide:
+1. A concise description including pros, cons, required resources and expected outcome
+2. Feasibility score (0-1)
+3. Impact score (0-1)
+4. Risk score (0-1, higher is riskier)
+5. Short reasoning for the scores
+
+Then pick the best option and explain why it was selected, how it addresses
+the original query and why it's better than the alternatives.
+
+Respond only with JSON in this format:
+{"options": [{"id": "option_1", "description": "...", "scores": {"feasibility": 0.8, "impact": 0.7, "risk": 0.3}, "reasoning": "..."}],
+ "best_id": "option_1",
+ "overall_reasoning": "..."}
+
+Example:
+{"options": [{"id": "option_1", "description": "Migrate the API to FastAPI: async support, small rewrite effort", "scores": {"feasibility": 0.8, "impact": 0.7, "risk": 0.2}, "reasoning": "Team already knows Python"},
+             {"id": "option_2", "description": "Rewrite the API in Go: best throughput, needs new skills", "scores": {"feasibility": 0.5, "impact": 0.8, "risk": 0.6}, "reasoning": "Large rewrite with hiring cost"},
+             {"id": "option_3", "description": "Keep the current stack and tune it: no migration cost", "scores": {"feasibility": 0.9, "impact": 0.3, "risk": 0.1}, "reasoning": "Limited upside"}],
+ "best_id": "option_1",
+ "overall_reasoning": "FastAPI gives most of the performance gain at a fraction of the risk of a full rewrite."}
+"""
+
+OPTION_GEN_SYSTEM_PROMPT = """
+Based on the user's query and data, generate 3 possible decision options.
+
+For each option provide:
+1. Option description
+2. Pros and cons
+3. Required resources
+4. Expected outcome
+
+Format as a list of options, starting each one with "Option N:".
+"""
+
+EVAL_SYSTEM_PROMPT = """
+Evaluate the decision option given by the user against the context data.
+
+Provide:
+1. Feasibility score (0-1)
+2. Impact score (0-1)
+3. Risk assessment
+4. Implementation complexity
+5. Overall recommendation
+"""
+
+VALIDATION_SYSTEM_PROMPT = """
+Validate the user's decision with the supporting evidence provided.
+
+Is this decision well-supported? Provide confidence level and any concerns.
+"""
+
+REASONING_SYSTEM_PROMPT = """
+Explain why the given option was selected.
+
+Provide clear reasoning focusing on:
+1. Key advantages
+2. How it addresses the original query
+3. Why it's better than alternatives
+"""
+
 class DecisionMakerAgent(BaseAgent):
     """Agent responsible for making decisions based on processed data"""
     
@@ -22,25 +102,49 @@ class DecisionMakerAgent(BaseAgent):
     
     async def process(self, state: AgentState) -> AgentState:
         """Make decisions based on processed data"""
+        search_task = None
         try:
             processed_data = state.get("processed_data", {})
             query = state["query"]
             
-            # Generate decision options
-            options = await self._generate_options(query, processed_data)
+            # Generate, evaluate and justify all options in a single LLM call
+            batch = await self._generate_and_evaluate_options(query, processed_data)
             
-            # Evaluate each option
-            evaluated_options = []
-            for option in options:
-                evaluation = await self._evaluate_option(option, processed_data)
-                evaluated_options.append(evaluation)
+            if batch is not None:
+                evaluated_options = batch["options"]
+            else:
+                # Fall back to generating and evaluating options one call at a time
+                self.logger.warning("Batched decision response could not be parsed, evaluating options individually")
+                evaluated_options = await self._evaluate_per_option(query, processed_data)
+            
+            # Only decisions below the confidence threshold are validated. The best
+            # score is known before the decision is made, so the paid search starts
+            # only when its result will be used, and overlaps with _make_decision.
+            best_score = max(self._weighted_score(evaluation) for evaluation in evaluated_options)
+            needs_validation = (self.decision_criteria["require_validation"]
+                                and best_score < self.decision_criteria["confidence_threshold"])
+            if needs_validation and "search_results" not in state["metadata"]:
+                search_task = asyncio.create_task(web_search.ainvoke(query))
             
-            # Make final decision
             decision = await self._make_decision(evaluated_options, processed_data)
             
-            # Validate decision if required
-            if self.decision_criteria["require_validation"]:
-                decision = await self._validate_decision(decision, state)
+            reasoning_task = None
+            if batch is not None:
+                decision["reasoning"] = self._select_reasoning(decision, batch)
+            else:
+                reasoning_task = self._generate_reasoning(decision["selected_option"], evaluated_options)
+            
+            if needs_validation and reasoning_task is not None:
+                # Reasoning and validation are independent, so run them in parallel
+                reasoning, decision = await asyncio.gather(
+                    reasoning_task,
+                    self._validate_decision(decision, state, search_task)
+                )
+                decision["reasoning"] = reasoning
+            elif needs_validation:
+                decision = await self._validate_decision(decision, state, search_task)
+            elif reasoning_task is not None:
+                decision["reasoning"] = await reasoning_task
             
             state["decisions"] = evaluated_options
             state["metadata"]["final_decision"] = decision
@@ -49,30 +153,90 @@ class DecisionMakerAgent(BaseAgent):
             return state
             
         except Exception as e:
+            if search_task is not None:
+                search_task.cancel()
             raise DecisionMakingException(f"Decision making failed: {str(e)}")
     
-    async def _generate_options(self, query: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Generate decision options based on query and data"""
+    async def _generate_and_evaluate_options(self, query: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Generate and score decision options with one structured LLM call"""
         prompt = f"""
-        Based on this query and data, generate 3 possible decision options:
         Query: {query}
-        Data Summary: {data.get('analysis', 'No data available')}
+        Data: {self._project_data(data)}
+        """
+        
+        response = await self.llm.ainvoke(prompt, system_prompt=BATCH_DECISION_SYSTEM_PROMPT)
+        parsed = parse_json_response(response.content)
+        
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("options"), list):
+            return None
         
-        For each option provide:
-        1. Option description
-        2. Pros and cons
-        3. Required resources
-        4. Expected outcome
+        evaluations = []
+        for i, option in enumerate(parsed["options"][:3]):
+            if not isinstance(option, dict) or not option.get("description"):
+                continue
+            scores = option.get("scores") if isinstance(option.get("scores"), dict) else {}
+            evaluations.append({
+                "option_id": str(option.get("id") or f"option_{i+1}"),
+                "description": str(option["description"]),
+                "evaluation": str(option.get("reasoning", "")),
+                "scores": {key: self._normalize_score(scores.get(key)) for key in _SCORE_PATTERNS}
+            })
+        
+        if not evaluations:
+            return None
         
-        Format as a list of options.
+        return {
+            "options": evaluations,
+            "best_id": str(parsed.get("best_id", "")),
+            "overall_reasoning": str(parsed.get("overall_reasoning", ""))
+        }
+    
+    def _select_reasoning(self, decision: Dict[str, Any], batch: Dict[str, Any]) -> str:
+        """Pick the batched reasoning that matches the selected option"""
+        selected = decision["selected_option"]
+        if selected["option_id"] == batch["best_id"] and batch["overall_reasoning"]:
+            return batch["overall_reasoning"]
+        return selected["evaluation"] or "No reasoning provided"
+    
+    async def _evaluate_per_option(self, query: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Generate options and evaluate them concurrently"""
+        options = await self._generate_options(query, data)
+        
+        # Evaluate all options concurrently, dropping any that fail
+        results = await asyncio.gather(
+            *(self._evaluate_option(option, data) for option in options),
+            return_exceptions=True
+        )
+        evaluated_options = []
+        for option, result in zip(options, results):
+            if isinstance(result, BaseException):
+                self.logger.warning(f"Evaluation of {option['id']} failed: {str(result)}")
+                continue
+            evaluated_options.append(result)
+        
+        if not evaluated_options:
+            raise DecisionMakingException("No options could be evaluated")
+        
+        return evaluated_options
+    
+    async def _generate_options(self, query: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Generate decision options based on query and data"""
+        prompt = f"""
+        Query: {query}
+        Data: {self._project_data(data)}
         """
         
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(prompt, system_prompt=OPTION_GEN_SYSTEM_PROMPT)
         
-        # Parse options from response
-        options = []
-        option_texts = response.content.split('\n\n')
+        # Parse options from response, dropping any preamble before the first option
+        parts = _OPTION_SPLIT_RE.split(response.content)
+        if len(parts) > 1:
+            option_texts = parts[1:]
+        else:
+            option_texts = response.content.split('\n\n')
+        option_texts = [text.strip() for text in option_texts if text.strip()]
         
+        options = []
         for i, option_text in enumerate(option_texts[:3]):
             options.append({
                 "id": f"option_{i+1}",
@@ -85,19 +249,11 @@ class DecisionMakerAgent(BaseAgent):
     async def _evaluate_option(self, option: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
         """Evaluate a single option"""
         prompt = f"""
-        Evaluate this decision option:
         Option: {option['description']}
-        Context Data: {data}
-        
-        Provide:
-        1. Feasibility score (0-1)
-        2. Impact score (0-1)
-        3. Risk assessment
-        4. Implementation complexity
-        5. Overall recommendation
+        Context Data: {self._project_data(data)}
         """
         
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(prompt, system_prompt=EVAL_SYSTEM_PROMPT)
         
         # Extract scores from response
         evaluation = {
@@ -111,21 +267,8 @@ class DecisionMakerAgent(BaseAgent):
     
     async def _make_decision(self, evaluations: List[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
         """Make final decision based on evaluations"""
-        # Calculate weighted scores
-        best_option = None
-        best_score = 0
-        
-        for evaluation in evaluations:
-            scores = evaluation.get("scores", {})
-            weighted_score = (
-                scores.get("feasibility", 0) * 0.3 +
-                scores.get("impact", 0) * 0.4 +
-                (1 - scores.get("risk", 0)) * 0.3
-            )
-            
-            if weighted_score > best_score:
-                best_score = weighted_score
-                best_option = evaluation
+        best_option = max(evaluations, key=self._weighted_score)
+        best_score = self._weighted_score(best_option)
         
         # Get additional context for decision
         if best_score < self.decision_criteria["confidence_threshold"]:
@@ -136,27 +279,36 @@ class DecisionMakerAgent(BaseAgent):
         decision = {
             "selected_option": best_option,
             "confidence": best_score,
-            "reasoning": await self._generate_reasoning(best_option, evaluations),
             "alternatives_considered": len(evaluations)
         }
         
         return decision
     
-    async def _validate_decision(self, decision: Dict[str, Any], state: AgentState) -> Dict[str, Any]:
+    @staticmethod
+    def _weighted_score(evaluation: Dict[str, Any]) -> float:
+        """Calculate the weighted score of an evaluated option"""
+        scores = evaluation.get("scores", {})
+        return (
+            scores.get("feasibility", 0) * _FEASIBILITY_WEIGHT +
+            scores.get("impact", 0) * _IMPACT_WEIGHT +
+            (1 - scores.get("risk", 0)) * _RISK_WEIGHT
+        )
+    
+    async def _validate_decision(self, decision: Dict[str, Any], state: AgentState,
+                                 search_task: Optional["asyncio.Task[str]"] = None) -> Dict[str, Any]:
         """Validate the decision with additional checks"""
-        # Search for supporting information
-        query = f"{state['query']} {decision['selected_option']['description']}"
-        search_results = await web_search(query)
+        # Use supporting information searched for the query while the decision was being made
+        if search_task is not None:
+            search_results = await search_task
+        else:
+            search_results = state["metadata"].get("search_results") or await web_search.ainvoke(state["query"])
         
         validation_prompt = f"""
-        Validate this decision with supporting evidence:
         Decision: {decision['selected_option']['description']}
         Evidence: {search_results}
-        
-        Is this decision well-supported? Provide confidence level and any concerns.
         """
         
-        response = await self.llm.ainvoke(validation_prompt)
+        response = await self.llm.ainvoke(validation_prompt, system_prompt=VALIDATION_SYSTEM_PROMPT)
         decision["validation"] = response.content
         
         return decision
@@ -164,45 +316,41 @@ class DecisionMakerAgent(BaseAgent):
     async def _gather_additional_info(self, evaluations: List[Dict[str, Any]]) -> str:
         """Gather additional information when confidence is low"""
         search_query = f"best practices {evaluations[0]['description']}"
-        results = await web_search(search_query)
+        results = await web_search.ainvoke(search_query)
         return results
     
     async def _generate_reasoning(self, selected: Dict[str, Any], all_options: List[Dict[str, Any]]) -> str:
         """Generate reasoning for the decision"""
         prompt = f"""
-        Explain why this option was selected:
         Selected: {selected['description']}
         All options considered: {len(all_options)}
-        
-        Provide clear reasoning focusing on:
-        1. Key advantages
-        2. How it addresses the original query
-        3. Why it's better than alternatives
         """
         
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(prompt, system_prompt=REASONING_SYSTEM_PROMPT)
         return response.content
     
+    def _normalize_score(self, value: Any) -> float:
+        """Coerce a score to the 0-1 range, defaulting to a middle score"""
+        try:
+            score = float(value)
+        except (TypeError, ValueError):
+            return 0.5
+        if score > 1:
+            score = score / 10
+        return min(max(score, 0.0), 1.0)
+    
     def _extract_scores(self, text: str) -> Dict[str, float]:
         """Extract numerical scores from evaluation text"""
-        import re
-        
         scores = {}
+        text_lower = text.lower()
         
-        # Try to find scores in format "score: 0.8" or "8/10"
-        patterns = {
-            "feasibility": r"feasibility.*?(\d*\.?\d+)",
-            "impact": r"impact.*?(\d*\.?\d+)",
-            "risk": r"risk.*?(\d*\.?\d+)"
-        }
-        
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text.lower())
+        for key, pattern in _SCORE_PATTERNS.items():
+            match = pattern.search(text_lower)
             if match:
                 score = float(match.group(1))
                 # Normalize to 0-1 if needed
                 if score > 1:
-                    score = score / 10
+                    score = min(score / 10, 1.0)
                 scores[key] = score
             else:
                 scores[key] = 0.5  # Default middle score
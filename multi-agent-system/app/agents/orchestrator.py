@@ -1,9 +1,29 @@
-from typing import Dict, Any, Optional
+import copy
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 from app.agents.base import BaseAgent
 from app.models.state import AgentState
 from app.services.llm_service import get_llm_service
 from app.models.schemas import TaskType
 
+_WHITESPACE_RE = re.compile(r"\s+")
+
+CLASSIFY_SYSTEM_PROMPT = """
+Classify the user's query into one of these task types:
+1. data_processing - For data analysis, calculations, extraction
+2. decision_making - For choices, recommendations, evaluations
+3. communication - For explanations, summaries, presentations
+
+Respond with only the task type name.
+"""
+
+ROUTING_SYSTEM_PROMPT = """
+Explain why the given routing path was chosen for the user's query.
+
+Be concise but clear about the reasoning.
+"""
+
 class OrchestratorAgent(BaseAgent):
     """Main orchestrator agent that routes queries to appropriate agents"""
     
@@ -24,10 +44,36 @@ class OrchestratorAgent(BaseAgent):
                 "process": TaskType.DATA_PROCESSING
             }
         }
+        self.parallel_indicators = ["and", "also", "additionally", "multiple", "various"]
+        
+        # Match all keywords in a single pass over the query
+        self._keyword_re = self._compile_matcher(self.routing_rules["keywords"])
+        self._parallel_re = self._compile_matcher(self.parallel_indicators, whole_words=True)
+        
+        # LRU cache of (task_type, routing, reasoning) keyed by normalized query and requested task type
+        self.routing_cache_size = 4096
+        self._routing_cache: "OrderedDict[Tuple[str, str], Tuple[str, Dict[str, Any], str]]" = OrderedDict()
+    
+    @staticmethod
+    def _compile_matcher(words, whole_words: bool = False) -> "re.Pattern[str]":
+        """Compile a list of literal words into one alternation pattern"""
+        pattern = "|".join(re.escape(word) for word in words)
+        return re.compile(rf"\b(?:{pattern})\b" if whole_words else pattern)
     
     async def process(self, state: AgentState) -> AgentState:
         """Analyze query and determine routing"""
         query = state["query"]
+        cache_key = (self._normalize_query(query), state["task_type"])
+        
+        # Reuse the routing of a previously seen query
+        cached = self._routing_cache.get(cache_key)
+        if cached is not None:
+            self._routing_cache.move_to_end(cache_key)
+            task_type, routing_path, reasoning = cached
+            state["task_type"] = task_type
+            state["metadata"]["routing_decision"] = copy.deepcopy(routing_path)
+            state["metadata"]["routing_reasoning"] = reasoning
+            return state
         
         # Determine task type if not specified
         if state["task_type"] == TaskType.GENERAL:
@@ -39,29 +85,30 @@ class OrchestratorAgent(BaseAgent):
         state["metadata"]["routing_decision"] = routing_path
         state["metadata"]["routing_reasoning"] = await self._explain_routing(routing_path, query)
         
+        self._cache_routing(cache_key, (state["task_type"], copy.deepcopy(routing_path), state["metadata"]["routing_reasoning"]))
+        
         return state
     
+    def _normalize_query(self, query: str) -> str:
+        """Normalize a query for use as a routing cache key"""
+        return _WHITESPACE_RE.sub(" ", query.strip().lower())
+    
+    def _cache_routing(self, key: Tuple[str, str], value: Tuple[str, Dict[str, Any], str]) -> None:
+        """Store a routing decision, evicting the least recently used entry when full"""
+        self._routing_cache[key] = value
+        self._routing_cache.move_to_end(key)
+        if len(self._routing_cache) > self.routing_cache_size:
+            self._routing_cache.popitem(last=False)
+    
     async def _determine_task_type(self, query: str) -> TaskType:
         """Determine the primary task type from the query"""
         # First try keyword matching
-        query_lower = query.lower()
-        for keyword, task_type in self.routing_rules["keywords"].items():
-            if keyword in query_lower:
-                return task_type
+        match = self._keyword_re.search(query.lower())
+        if match:
+            return self.routing_rules["keywords"][match.group(0)]
         
         # Use LLM for complex classification
-        prompt = f"""
-        Classify this query into one of these task types:
-        1. data_processing - For data analysis, calculations, extraction
-        2. decision_making - For choices, recommendations, evaluations
-        3. communication - For explanations, summaries, presentations
-        
-        Query: {query}
-        
-        Respond with only the task type name.
-        """
-        
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(f"Query: {query}", system_prompt=CLASSIFY_SYSTEM_PROMPT)
         task_type_str = response.content.strip().lower()
         
         try:
@@ -88,28 +135,30 @@ class OrchestratorAgent(BaseAgent):
             # Complex query might need all agents
             routing["primary_path"] = ["data_processor", "decision_maker", "communicator"]
         
-        # Check if parallel processing would be beneficial
-        if self._needs_parallel_processing(query):
+        # Each stage of the DAG runs after the previous one; agents within a stage run concurrently
+        routing["dag"] = [[agent] for agent in routing["primary_path"]]
+        
+        # Check if parallel processing would be beneficial. Search results are only
+        # read by the decision maker, so the search runs only on paths that reach it.
+        path = routing["primary_path"]
+        if "data_processor" in path and "decision_maker" in path and self._needs_parallel_processing(query):
             routing["parallel_processing"] = True
             routing["parallel_agents"] = ["data_processor", "web_searcher"]
+            routing["dag"][path.index("data_processor")] = list(routing["parallel_agents"])
         
         return routing
     
     async def _explain_routing(self, routing: Dict[str, Any], query: str) -> str:
         """Generate explanation for routing decision"""
         prompt = f"""
-        Explain why this routing path was chosen:
         Query: {query}
         Routing: {routing['primary_path']}
-        
-        Be concise but clear about the reasoning.
         """
         
-        response = await self.llm.ainvoke(prompt)
+        response = await self.llm.ainvoke(prompt, system_prompt=ROUTING_SYSTEM_PROMPT)
         return response.content
     
     def _needs_parallel_processing(self, query: str) -> bool:
         """Determine if query would benefit from parallel processing"""
         # Simple heuristic - queries with multiple questions or complex requirements
-        indicators = ["and", "also", "additionally", "multiple", "various"]
-        return any(indicator in query.lower() for indicator in indicators)
\ No newline at end of file
+        return self._parallel_re.search(query.lower()) is not None
\ No newline at end of file
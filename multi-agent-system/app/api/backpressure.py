@@ -0,0 +1,61 @@
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.logging import setup_logging
+from app.core.config import get_settings
+from app.api.endpoints import HEALTH_PATH
+from typing import Dict
+
+logger = setup_logging()
+settings = get_settings()
+
+# Paths that are always served, so health checks keep working under load
+_EXEMPT_PATHS = frozenset({HEALTH_PATH})
+
+class ConnectionMetrics:
+    """Counts in-flight requests for a single worker
+    
+    Requests run on one event loop, so the counters need no locking.
+    """
+    
+    def __init__(self):
+        self.active = 0
+        self.rejected = 0
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Get connection statistics"""
+        return {"active": self.active, "rejected": self.rejected}
+
+connection_metrics = ConnectionMetrics()
+
+class ConnectionLimitMiddleware:
+    """Reject requests with 503 once the worker has too many in flight
+    
+    A request counts as in flight until its response body has been sent,
+    including streamed responses.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in _EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        if connection_metrics.active >= settings.max_connections:
+            connection_metrics.rejected += 1
+            logger.warning(f"Rejecting {scope['path']}: {connection_metrics.active} requests in flight")
+            response = ORJSONResponse(
+                status_code=503,
+                content={"error": "overloaded"},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        connection_metrics.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            connection_metrics.active -= 1
\ No newline at end of file
@@ -1,16 +1,92 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.models.schemas import AgentRequest, AgentResponse, ErrorResponse
-from app.services.graph_builder import create_agent_graph
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import Response, StreamingResponse
+from app.models.schemas import AgentRequest, AgentResponse, ErrorResponse, TaskType
 from app.models.state import AgentState
 from app.core.logging import setup_logging
-import time
-from typing import Dict, Any
+from app.core.config import get_settings
+from app.services.result_cache import ResultCache
+from statistics import fmean
+from time import perf_counter
+from typing import Dict, Any, AsyncIterator
+import orjson
 
 logger = setup_logging()
+settings = get_settings()
 router = APIRouter(prefix="/api/v1", tags=["agents"])
 
-# Create agent graph on startup
-agent_graph = create_agent_graph()
+# Full health check path, used by middleware that lets probes through untouched
+_HEALTH_ROUTE = "/health"
+HEALTH_PATH = router.prefix + _HEALTH_ROUTE
+
+# Cache of recent results for identical requests
+result_cache = ResultCache(max_size=settings.result_cache_size, ttl=settings.result_cache_ttl)
+
+# Static agent information served by /agents
+_AGENTS_INFO = {
+    "orchestrator": {
+        "name": "Orchestrator",
+        "description": "Routes and coordinates tasks between specialized agents",
+        "capabilities": ["task routing", "agent coordination", "query analysis"]
+    },
+    "data_processor": {
+        "name": "Data Processor",
+        "description": "Processes and transforms data, extracts insights",
+        "capabilities": ["data extraction", "transformation", "analysis", "entity recognition"]
+    },
+    "decision_maker": {
+        "name": "Decision Maker",
+        "description": "Makes informed decisions based on data and context",
+        "capabilities": ["option generation", "evaluation", "recommendation", "validation"]
+    },
+    "communicator": {
+        "name": "Communicator",
+        "description": "Formats and presents information clearly",
+        "capabilities": ["formatting", "summarization", "insight generation", "style adaptation"]
+    }
+}
+
+# Metadata produced for agents only, not returned to clients
+_INTERNAL_METADATA_KEYS = frozenset({"search_results"})
+
+# Health probes are frequent, so the body is serialized once
+_HEALTH_BYTES = orjson.dumps({"status": "healthy", "service": "multi-agent-system"})
+
+_AGENTS_PAYLOAD = {
+    "agents": _AGENTS_INFO,
+    "total_agents": len(_AGENTS_INFO),
+    "task_types": [task_type.value for task_type in TaskType]
+}
+
+def _build_state(request: AgentRequest) -> AgentState:
+    """Build the initial agent state for a request"""
+    # Copy request metadata so the state never aliases the request's dict
+    metadata = dict(request.metadata or ())
+    if request.context:
+        metadata["context"] = request.context
+    
+    return {
+        "messages": [request.query],
+        "query": request.query,
+        "task_type": request.task_type,
+        "processed_data": None,
+        "decisions": None,
+        "final_output": None,
+        "agent_path": [],
+        "confidence_scores": {},
+        "errors": [],
+        "metadata": metadata
+    }
+
+async def _sse_events(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Wrap text chunks as Server-Sent Events"""
+    try:
+        async for chunk in chunks:
+            if chunk:
+                yield "".join(f"data: {line}\n" for line in chunk.split("\n")) + "\n"
+        yield "event: done\ndata: \n\n"
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        yield f"event: error\ndata: {str(e).replace(chr(10), ' ')}\n\n"
 
 @router.post(
     "/process",
@@ -20,93 +96,104 @@ agent_graph = create_agent_graph()
         500: {"model": ErrorResponse, "description": "Internal Server Error"}
     }
 )
-async def process_query(request: AgentRequest) -> AgentResponse:
+async def process_query(request: AgentRequest, req: Request) -> AgentResponse:
     """
     Process a query through the multi-agent system
     
     The system will automatically route the query through appropriate agents
     based on the task type and content.
     """
-    start_time = time.time()
+    start_time = perf_counter()
+    
+    # Serve repeated requests from the result cache unless the caller opts out
+    cache_key = None
+    request_metadata = request.metadata or {}
+    if not request_metadata.get("no_cache"):
+        cache_key = ResultCache.make_key(request.query, request.task_type, request.context, request_metadata)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Serving cached result for query: {request.query[:50]}...")
+            return AgentResponse(**cached, processing_time=perf_counter() - start_time)
     
     try:
         # Initialize state
-        state: AgentState = {
-            "messages": [request.query],
-            "query": request.query,
-            "task_type": request.task_type.value,
-            "processed_data": None,
-            "decisions": None,
-            "final_output": None,
-            "agent_path": [],
-            "confidence_scores": {},
-            "errors": [],
-            "metadata": request.metadata or {}
-        }
-        
-        # Add context to state if provided
-        if request.context:
-            state["metadata"]["context"] = request.context
+        state = _build_state(request)
         
         logger.info(f"Processing query: {request.query[:50]}...")
         
         # Execute agent graph
-        result = await agent_graph.ainvoke(state)
+        result = await req.app.state.agent_graph.ainvoke(state)
         
         # Calculate processing time
-        processing_time = time.time() - start_time
+        processing_time = perf_counter() - start_time
         
         # Extract confidence score
-        overall_confidence = sum(result["confidence_scores"].values()) / len(result["confidence_scores"]) if result["confidence_scores"] else 0.5
+        scores = result["confidence_scores"]
+        overall_confidence = fmean(scores.values()) if scores else 0.5
         
-        return AgentResponse(
+        response = AgentResponse(
             result=result["final_output"] or "No output generated",
             task_type=result["task_type"],
             agent_path=result["agent_path"],
             confidence_score=overall_confidence,
             processing_time=processing_time,
-            metadata=result["metadata"]
+            metadata={
+                key: value for key, value in result["metadata"].items()
+                if key not in _INTERNAL_METADATA_KEYS
+            }
         )
         
+        if cache_key is not None and result["final_output"]:
+            result_cache.set(cache_key, response.model_dump(exclude={"processing_time", "timestamp"}))
+        
+        return response
+        
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/health")
-async def health_check() -> Dict[str, str]:
+@router.post("/process/stream")
+async def process_query_stream(request: AgentRequest, req: Request) -> StreamingResponse:
+    """
+    Process a query and stream the final response as Server-Sent Events
+    
+    Routing, data processing and decision making run as in /process; the
+    communicator's answer is streamed as it is generated.
+    """
+    streaming_communicator = req.app.state.streaming_communicator
+    try:
+        state = _build_state(request)
+        
+        logger.info(f"Streaming query: {request.query[:50]}...")
+        
+        result = await req.app.state.streaming_graph.ainvoke(state)
+        
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        _sse_events(streaming_communicator.aprocess_stream(result)),
+        media_type="text/event-stream"
+    )
+
+@router.get("/cache/stats")
+async def cache_stats() -> Dict[str, Any]:
+    """Result cache statistics"""
+    return result_cache.stats
+
+@router.post("/cache/clear")
+async def clear_cache() -> Dict[str, str]:
+    """Remove all cached results"""
+    result_cache.clear()
+    return {"status": "cleared"}
+
+@router.get(_HEALTH_ROUTE, response_class=Response)
+async def health_check() -> Response:
     """Health check endpoint"""
-    return {"status": "healthy", "service": "multi-agent-system"}
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 @router.get("/agents")
 async def list_agents() -> Dict[str, Any]:
     """List all available agents and their capabilities"""
-    from app.agents import orchestrator, data_processor, decision_maker, communicator
-    
-    agents_info = {
-        "orchestrator": {
-            "name": "Orchestrator",
-            "description": "Routes and coordinates tasks between specialized agents",
-            "capabilities": ["task routing", "agent coordination", "query analysis"]
-        },
-        "data_processor": {
-            "name": "Data Processor",
-            "description": "Processes and transforms data, extracts insights",
-            "capabilities": ["data extraction", "transformation", "analysis", "entity recognition"]
-        },
-        "decision_maker": {
-            "name": "Decision Maker",
-            "description": "Makes informed decisions based on data and context",
-            "capabilities": ["option generation", "evaluation", "recommendation", "validation"]
-        },
-        "communicator": {
-            "name": "Communicator",
-            "description": "Formats and presents information clearly",
-            "capabilities": ["formatting", "summarization", "insight generation", "style adaptation"]
-        }
-    }
-    
-    return {
-        "agents": agents_info,
-        "total_agents": len(agents_info),
-        "task_types": ["data_processing", "decision_making", "communication", "general"]
-    }
\ No newline at end of file
+    return _AGENTS_PAYLOAD
\ No newline at end of file
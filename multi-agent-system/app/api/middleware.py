@@ -1,58 +1,79 @@
-from fastapi import Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.core.logging import setup_logging
 from app.core.exceptions import AgentException
-import time
-import uuid
-from typing import Callable
+from app.api.endpoints import HEALTH_PATH
+from time import perf_counter
+import secrets
 
 logger = setup_logging()
 
-async def error_handler_middleware(request: Request, call_next: Callable):
-    """Global error handler middleware"""
-    try:
-        response = await call_next(request)
-        return response
-    except AgentException as e:
-        logger.error(f"Agent error: {str(e)}")
-        return JSONResponse(
-            status_code=400,
-            content={
-                "error": str(e),
-                "error_type": e.__class__.__name__,
-                "request_id": request.state.request_id
-            }
-        )
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-        return JSONResponse(
-            status_code=500,
-            content={
-                "error": "Internal server error",
-                "error_type": "UnexpectedError",
-                "request_id": request.state.request_id
-            }
-        )
+# Health probes skip request IDs, timing headers and access logging
+_UNTRACKED_PATHS = frozenset({HEALTH_PATH})
 
-async def request_id_middleware(request: Request, call_next: Callable):
-    """Add unique request ID to each request"""
-    request_id = str(uuid.uuid4())
-    request.state.request_id = request_id
+class CombinedMiddleware:
+    """Assign a request ID, convert errors to JSON responses and write the access log
     
-    response = await call_next(request)
-    response.headers["X-Request-ID"] = request_id
+    Implemented as plain ASGI rather than BaseHTTPMiddleware, so requests are not
+    wrapped in extra Request/Response objects and response bodies pass through
+    without being re-streamed.
+    """
     
-    return response
-
-async def timing_middleware(request: Request, call_next: Callable):
-    """Log request timing"""
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    logger.info(f"Request {request.url.path} took {process_time:.2f}s")
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    return response
\ No newline at end of file
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in _UNTRACKED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        # 64 random bits are plenty to correlate log lines for a request
+        request_id = secrets.token_hex(8)
+        scope.setdefault("state", {})["request_id"] = request_id
+        start_time = perf_counter()
+        response_started = False
+        status_code = 500
+        
+        async def send_with_headers(message: Message) -> None:
+            nonlocal response_started, status_code
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("X-Process-Time", str(perf_counter() - start_time))
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except AgentException as e:
+            logger.exception("Agent error")
+            if response_started:
+                raise
+            response = ORJSONResponse(
+                status_code=400,
+                content={
+                    "error": str(e),
+                    "error_type": e.__class__.__name__,
+                    "request_id": request_id
+                }
+            )
+            await response(scope, receive, send_with_headers)
+        except Exception:
+            logger.exception("Unexpected error")
+            if response_started:
+                raise
+            response = ORJSONResponse(
+                status_code=500,
+                content={
+                    "error": "Internal server error",
+                    "error_type": "UnexpectedError",
+                    "request_id": request_id
+                }
+            )
+            await response(scope, receive, send_with_headers)
+        
+        # Replaces uvicorn's access log, which is disabled in main.py
+        process_time = perf_counter() - start_time
+        logger.info(f"{scope['method']} {scope['path']} {status_code} {process_time:.3f}s")
\ No newline at end of file
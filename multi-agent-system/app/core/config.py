@@ -15,16 +15,24 @@ class Settings(BaseSettings):
     app_name: str = Field(default="Multi-Agent System", alias="APP_NAME")
     debug: bool = Field(default=False, alias="DEBUG")
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
+    workers: int = Field(default=1, alias="WEB_CONCURRENCY")
+    max_connections: int = Field(default=256, alias="MAX_CONNECTIONS")
     
     # Model Configuration
     llm_model: str = Field(default="llama3-70b-8192", alias="LLM_MODEL")
     temperature: float = Field(default=0.7, alias="TEMPERATURE")
     max_retries: int = Field(default=3, alias="MAX_RETRIES")
+    llm_max_connections: int = Field(default=100, alias="LLM_MAX_CONNECTIONS")
+    llm_max_keepalive_connections: int = Field(default=50, alias="LLM_MAX_KEEPALIVE_CONNECTIONS")
     
     # Agent Configuration
     agent_timeout: int = Field(default=30, alias="AGENT_TIMEOUT")
     max_search_results: int = Field(default=5, alias="MAX_SEARCH_RESULTS")
     
+    # Result Cache Configuration
+    result_cache_size: int = Field(default=1024, alias="RESULT_CACHE_SIZE")
+    result_cache_ttl: float = Field(default=300.0, alias="RESULT_CACHE_TTL")
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,24 +1,53 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 from app.core.config import get_settings
 
+_configured = False
+
 def setup_logging(log_level: Optional[str] = None):
-    """Configure application logging"""
+    """Configure application logging
+    
+    Safe to call more than once; only the first call installs handlers. Records
+    are queued and written to stdout and app.log by a background thread, so
+    logging never blocks the event loop on I/O.
+    """
+    global _configured
+    if _configured:
+        return logging.getLogger(__name__)
+    
     settings = get_settings()
     level = getattr(logging, log_level or settings.log_level.upper())
     
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    output_handlers = [
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('app.log')
+    ]
+    for handler in output_handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # The queue handler only renders the message; the output handlers add the
+    # full format, so records are not formatted twice
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    
     logging.basicConfig(
         level=level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler('app.log')
-        ]
+        handlers=[queue_handler]
     )
     
     # Set third-party loggers to WARNING
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("langchain").setLevel(logging.WARNING)
     
+    _configured = True
     return logging.getLogger(__name__)
\ No newline at end of file
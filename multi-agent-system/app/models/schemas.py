@@ -1,7 +1,12 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from typing import Optional, Dict, Any, List
+from typing_extensions import Annotated
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import partial
+
+# Timezone-aware replacement for the deprecated datetime.utcnow
+_utcnow = partial(datetime.now, timezone.utc)
 
 class TaskType(str, Enum):
     """Enumeration of available task types"""
@@ -12,17 +17,13 @@ class TaskType(str, Enum):
 
 class AgentRequest(BaseModel):
     """Request model for agent operations"""
-    query: str = Field(..., min_length=1, description="User query or task description")
-    task_type: Optional[TaskType] = Field(default=TaskType.GENERAL, description="Specific task type")
-    context: Optional[Dict[str, Any]] = Field(default={}, description="Additional context")
-    metadata: Optional[Dict[str, Any]] = Field(default={}, description="Request metadata")
+    model_config = ConfigDict(use_enum_values=True)
     
-    @validator('query')
-    def validate_query(cls, v):
-        v = v.strip()
-        if not v:
-            raise ValueError("Query cannot be empty")
-        return v
+    # Stripping and the empty check run in pydantic-core rather than a Python validator
+    query: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)] = Field(..., description="User query or task description")
+    task_type: Optional[TaskType] = Field(default=TaskType.GENERAL.value, description="Specific task type")
+    context: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional context")
+    metadata: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Request metadata")
 
 class AgentResponse(BaseModel):
     """Response model for agent operations"""
@@ -31,12 +32,12 @@ class AgentResponse(BaseModel):
     agent_path: List[str] = Field(..., description="Agents involved in processing")
     confidence_score: float = Field(..., ge=0.0, le=1.0, description="Confidence in result")
     processing_time: float = Field(..., description="Time taken to process in seconds")
-    metadata: Dict[str, Any] = Field(default={}, description="Additional metadata")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Additional metadata")
+    timestamp: datetime = Field(default_factory=_utcnow)
 
 class ErrorResponse(BaseModel):
     """Error response model"""
     error: str = Field(..., description="Error message")
     error_type: str = Field(..., description="Type of error")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utcnow)
     details: Optional[Dict[str, Any]] = Field(default=None, description="Error details")
\ No newline at end of file
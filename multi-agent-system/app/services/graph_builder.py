@@ -5,6 +5,10 @@ from app.agents.data_processor import DataProcessorAgent
 from app.agents.decision_maker import DecisionMakerAgent
 from app.agents.communicator import CommunicatorAgent
 from app.models.schemas import TaskType
+from app.services.tools import web_search
+from typing import Any, Dict, List
+from functools import lru_cache
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,16 +21,25 @@ class GraphBuilder:
         self.data_processor = DataProcessorAgent()
         self.decision_maker = DecisionMakerAgent()
         self.communicator = CommunicatorAgent()
+        
+        # Non-graph producers that may run alongside an agent in the same DAG stage
+        self.stage_tasks = {
+            "web_searcher": self._search_web
+        }
     
-    def build(self) -> StateGraph:
-        """Build the agent graph with dynamic routing"""
+    def build(self, defer_communication: bool = False) -> StateGraph:
+        """Build the agent graph with dynamic routing
+        
+        With defer_communication, the communicator node is a pass-through and the
+        caller is expected to stream the final output from the communicator itself.
+        """
         graph = StateGraph(AgentState)
         
         # Add nodes
         graph.add_node("orchestrator", self.orchestrator.execute)
-        graph.add_node("data_processor", self.data_processor.execute)
+        graph.add_node("data_processor", self._execute_data_stage)
         graph.add_node("decision_maker", self.decision_maker.execute)
-        graph.add_node("communicator", self.communicator.execute)
+        graph.add_node("communicator", self._defer_communication if defer_communication else self.communicator.execute)
         
         # Add edges
         graph.add_edge(START, "orchestrator")
@@ -60,6 +73,43 @@ class GraphBuilder:
         
         return graph.compile()
     
+    async def _execute_data_stage(self, state: AgentState) -> AgentState:
+        """Run the data processor together with any independent producers in its DAG stage"""
+        stage = self._find_stage(state, "data_processor")
+        companions = [name for name in stage if name in self.stage_tasks]
+        
+        if not companions:
+            return await self.data_processor.execute(state)
+        
+        logger.info(f"Running data_processor in parallel with {', '.join(companions)}")
+        
+        # Companions only read the state; their results are merged into metadata afterwards
+        state, *results = await asyncio.gather(
+            self.data_processor.execute(state),
+            *(self.stage_tasks[name](state) for name in companions)
+        )
+        for result in results:
+            state["metadata"].update(result)
+        
+        return state
+    
+    def _find_stage(self, state: AgentState, agent: str) -> List[str]:
+        """Return the DAG stage containing the given agent"""
+        dag = state.get("metadata", {}).get("routing_decision", {}).get("dag", [])
+        for stage in dag:
+            if agent in stage:
+                return stage
+        return [agent]
+    
+    async def _search_web(self, state: AgentState) -> Dict[str, Any]:
+        """Fetch web search results for the query"""
+        results = await web_search.ainvoke(state["query"])
+        return {"search_results": results}
+    
+    async def _defer_communication(self, state: AgentState) -> AgentState:
+        """Leave the final communication to the caller"""
+        return state
+    
     def _route_from_orchestrator(self, state: AgentState) -> str:
         """Determine routing from orchestrator"""
         routing = state.get("metadata", {}).get("routing_decision", {})
@@ -85,7 +135,21 @@ class GraphBuilder:
         logger.info("Routing from data processor to communicator")
         return "communicator"
 
+@lru_cache(maxsize=1)
+def get_graph_builder() -> GraphBuilder:
+    """Get the shared graph builder, so every graph uses the same agents and caches"""
+    return GraphBuilder()
+
+@lru_cache(maxsize=1)
 def create_agent_graph():
     """Factory function to create agent graph"""
-    builder = GraphBuilder()
-    return builder.build()
\ No newline at end of file
+    return get_graph_builder().build()
+
+@lru_cache(maxsize=1)
+def create_streaming_agent_graph():
+    """Factory function to create an agent graph whose final output is streamed
+    
+    Returns the compiled graph together with the communicator that streams the output.
+    """
+    builder = get_graph_builder()
+    return builder.build(defer_communication=True), builder.communicator
\ No newline at end of file
@@ -1,39 +1,103 @@
 from langchain_groq import ChatGroq
+import groq
+import httpx
+from langchain_core.messages import SystemMessage, HumanMessage
 from app.core.config import get_settings
 from app.core.exceptions import LLMException
 from functools import lru_cache
 import asyncio
-from typing import Optional, Any
+import logging
+import orjson
+import re
+from typing import Optional, Any, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+def parse_json_response(text: str) -> Optional[Any]:
+    """Parse JSON from an LLM response, tolerating surrounding prose or code fences"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        match = _JSON_OBJECT_RE.search(text)
+        if not match:
+            return None
+        try:
+            return orjson.loads(match.group(0))
+        except orjson.JSONDecodeError:
+            return None
 
 class LLMService:
     """Service for managing LLM interactions"""
     
     def __init__(self):
         self.settings = get_settings()
+        
+        # One pooled HTTP/2 client shared by every agent, so concurrent calls reuse connections
+        self.http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=self.settings.llm_max_connections,
+                max_keepalive_connections=self.settings.llm_max_keepalive_connections
+            )
+        )
+        async_client = groq.AsyncGroq(
+            api_key=self.settings.groq_api_key,
+            max_retries=self.settings.max_retries,
+            http_client=self.http_client
+        )
+        
         self.llm = ChatGroq(
             model=self.settings.llm_model,
             groq_api_key=self.settings.groq_api_key,
             temperature=self.settings.temperature,
-            max_retries=self.settings.max_retries
+            max_retries=self.settings.max_retries,
+            async_client=async_client.chat.completions
         )
     
-    async def ainvoke(self, prompt: str, **kwargs) -> Any:
+    def _build_input(self, prompt: str, system_prompt: Optional[str] = None) -> Any:
+        """Build LLM input, keeping static instructions ahead of per-call content.
+        
+        A stable system prompt gives every call the same prefix, which lets the
+        provider reuse its prompt cache instead of re-processing the instructions.
+        """
+        if system_prompt is None:
+            return prompt
+        return [SystemMessage(content=system_prompt), HumanMessage(content=prompt)]
+    
+    async def ainvoke(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> Any:
         """Async invoke LLM with error handling"""
         try:
-            response = await self.llm.ainvoke(prompt, **kwargs)
+            response = await self.llm.ainvoke(self._build_input(prompt, system_prompt), **kwargs)
             return response
         except Exception as e:
-            raise LLMException(f"LLM invocation failed: {str(e)}")
+            logger.warning("LLM invocation failed: %s", e)
+            raise LLMException("LLM invocation failed") from e
     
-    def invoke(self, prompt: str, **kwargs) -> Any:
+    async def astream(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> AsyncIterator[Any]:
+        """Async stream LLM output chunks with error handling"""
+        try:
+            async for chunk in self.llm.astream(self._build_input(prompt, system_prompt), **kwargs):
+                yield chunk
+        except Exception as e:
+            logger.warning("LLM streaming failed: %s", e)
+            raise LLMException("LLM streaming failed") from e
+    
+    def invoke(self, prompt: str, system_prompt: Optional[str] = None, **kwargs) -> Any:
         """Sync invoke LLM with error handling"""
         try:
-            response = self.llm.invoke(prompt, **kwargs)
+            response = self.llm.invoke(self._build_input(prompt, system_prompt), **kwargs)
             return response
         except Exception as e:
-            raise LLMException(f"LLM invocation failed: {str(e)}")
+            logger.warning("LLM invocation failed: %s", e)
+            raise LLMException("LLM invocation failed") from e
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client"""
+        await self.http_client.aclose()
 
-@lru_cache()
+@lru_cache(maxsize=1)
 def get_llm_service() -> LLMService:
     """Get cached LLM service instance"""
     return LLMService()
\ No newline at end of file
@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Any, Dict, Optional, Tuple
+import orjson
+import time
+
+class ResultCache:
+    """In-memory LRU cache with a per-entry TTL for processed query results"""
+    
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    @staticmethod
+    def make_key(
+        query: str,
+        task_type: str,
+        context: Optional[Dict[str, Any]],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Build a cache key from the inputs that determine a result
+        
+        Request metadata is echoed back in the response, so it is part of the key
+        to keep one caller's metadata from being served to another.
+        """
+        payload = orjson.dumps(
+            [query, task_type, context or {}, metadata or {}],
+            option=orjson.OPT_SORT_KEYS,
+            default=str
+        )
+        return blake2b(payload, digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a result, evicting the least recently used entry when full"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all cached results"""
+        self._entries.clear()
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
\ No newline at end of file
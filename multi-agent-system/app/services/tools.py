@@ -3,10 +3,15 @@ from langchain_community.tools.tavily_search import TavilySearchResults
 from app.core.config import get_settings
 import asyncio
 from typing import Dict, Any, List
+from io import StringIO
+import csv
+import orjson
 import re
 
 settings = get_settings()
 
+_NUM_RE = re.compile(r'-?\d+\.?\d*')
+
 @tool
 async def web_search(query: str) -> str:
     """
@@ -51,21 +56,21 @@ def calculate_metrics(data: Dict[str, Any]) -> Dict[str, float]:
         numbers = []
         
         # Extract all numbers from data
-        for key, value in data.items():
+        for value in data.values():
             if isinstance(value, (int, float)):
                 numbers.append(value)
             elif isinstance(value, str):
                 # Extract numbers from string
-                found_numbers = re.findall(r'-?\d+\.?\d*', value)
-                numbers.extend([float(n) for n in found_numbers])
+                numbers.extend(map(float, _NUM_RE.findall(value)))
         
         if not numbers:
             return {"error": "No numerical data found"}
         
+        total = sum(numbers)
         metrics = {
             "count": len(numbers),
-            "sum": sum(numbers),
-            "average": sum(numbers) / len(numbers),
+            "sum": total,
+            "average": total / len(numbers),
             "min": min(numbers),
             "max": max(numbers)
         }
@@ -86,13 +91,9 @@ def format_data(data: Any, format_type: str = "json") -> str:
     Returns:
         Formatted data string
     """
-    import json
-    import csv
-    from io import StringIO
-    
     try:
         if format_type == "json":
-            return json.dumps(data, indent=2)
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
         
         elif format_type == "csv" and isinstance(data, list):
             output = StringIO()
@@ -104,12 +105,9 @@ def format_data(data: Any, format_type: str = "json") -> str:
         
         elif format_type == "markdown":
             if isinstance(data, dict):
-                lines = []
-                for key, value in data.items():
-                    lines.append(f"- **{key}**: {value}")
-                return "\n".join(lines)
+                return "\n".join(f"- **{key}**: {value}" for key, value in data.items())
             elif isinstance(data, list):
-                return "\n".join([f"- {item}" for item in data])
+                return "\n".join(f"- {item}" for item in data)
         
         return str(data)
     
@@ -1,9 +1,13 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.endpoints import router
-from app.api.middleware import error_handler_middleware, request_id_middleware, timing_middleware
+from app.api.middleware import CombinedMiddleware
+from app.api.backpressure import ConnectionLimitMiddleware
 from app.core.logging import setup_logging
 from app.core.config import get_settings
+from app.services.llm_service import get_llm_service
+from app.services.graph_builder import create_agent_graph, create_streaming_agent_graph, get_graph_builder
 import uvicorn
 
 # Setup logging
@@ -15,13 +19,16 @@ app = FastAPI(
     title="Multi-Agent System API",
     description="A modular AI agent system with specialized agents for data processing, decision-making, and communication",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=ORJSONResponse
 )
 
 # Add middleware
-app.middleware("http")(error_handler_middleware)
-app.middleware("http")(request_id_middleware)
-app.middleware("http")(timing_middleware)
+app.add_middleware(CombinedMiddleware)
+
+# Added after CombinedMiddleware so it wraps it: overloaded requests are rejected
+# before request IDs, timing or routing. CORSMiddleware, added below, is outermost.
+app.add_middleware(ConnectionLimitMiddleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -40,18 +47,35 @@ async def startup_event():
     """Initialize services on startup"""
     logger.info(f"Starting {settings.app_name}")
     logger.info(f"Debug mode: {settings.debug}")
+    
+    # Build the agent graphs once per worker and share them across requests
+    app.state.agent_graph = create_agent_graph()
+    app.state.streaming_graph, app.state.streaming_communicator = create_streaming_agent_graph()
+    
     logger.info("All systems initialized successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down application")
+    await get_llm_service().aclose()
+    
+    # The cached service and graphs hold the closed HTTP client; drop them so a
+    # later startup in the same process builds fresh ones
+    get_llm_service.cache_clear()
+    get_graph_builder.cache_clear()
+    create_agent_graph.cache_clear()
+    create_streaming_agent_graph.cache_clear()
 
 if __name__ == "__main__":
+    # Reload mode only supports a single worker process. Access logging is done
+    # by CombinedMiddleware, so uvicorn's own access log is switched off.
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
-        log_level=settings.log_level.lower()
+        workers=1 if settings.debug else settings.workers,
+        log_level=settings.log_level.lower(),
+        access_log=False
     )
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+
+# Settings are read at import time by the tools module
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+from app.agents.decision_maker import _OPTION_SPLIT_RE
+from app.services import result_cache
+from app.services.llm_service import parse_json_response
+from app.services.result_cache import ResultCache
+
+class FakeClock:
+    """Controllable replacement for time.monotonic"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+def test_result_cache_returns_stored_value():
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.set("a", {"result": 1})
+    
+    assert cache.get("a") == {"result": 1}
+    assert cache.get("missing") is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+def test_result_cache_expires_entries_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    cache = ResultCache(max_size=2, ttl=10)
+    cache.set("a", {"result": 1})
+    
+    clock.now += 9
+    assert cache.get("a") == {"result": 1}
+    
+    clock.now += 2
+    assert cache.get("a") is None
+    assert cache.stats["size"] == 0
+
+def test_result_cache_evicts_least_recently_used():
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.set("a", {"result": 1})
+    cache.set("b", {"result": 2})
+    
+    # Reading "a" makes "b" the least recently used entry
+    cache.get("a")
+    cache.set("c", {"result": 3})
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == {"result": 1}
+    assert cache.get("c") == {"result": 3}
+
+def test_result_cache_key_ignores_dict_ordering():
+    first = ResultCache.make_key("q", "general", {"x": 1, "y": 2}, {"user": "a", "session": "s"})
+    second = ResultCache.make_key("q", "general", {"y": 2, "x": 1}, {"session": "s", "user": "a"})
+    
+    assert first == second
+
+def test_result_cache_key_depends_on_metadata():
+    key_a = ResultCache.make_key("q", "general", {}, {"user": "a"})
+    key_b = ResultCache.make_key("q", "general", {}, {"user": "b"})
+    
+    assert key_a != key_b
+    assert ResultCache.make_key("q", "general", None, None) == ResultCache.make_key("q", "general", {}, {})
+
+def test_parse_json_response_plain_json():
+    assert parse_json_response('{"style": "casual", "insights": ["a"]}') == {"style": "casual", "insights": ["a"]}
+
+def test_parse_json_response_code_fence_and_prose():
+    text = 'Here is the result:\n```json\n{"best_id": "option_1"}\n```\nLet me know.'
+    
+    assert parse_json_response(text) == {"best_id": "option_1"}
+
+def test_parse_json_response_invalid():
+    assert parse_json_response("no json here") is None
+    assert parse_json_response('{"message": "unterminated}') is None
+
+def test_option_split_handles_heading_styles():
+    text = "Here are options:\nOption 1: Use Python\n**Option 2.** Use Go\n## Option 3) Use Rust"
+    parts = _OPTION_SPLIT_RE.split(text)
+    
+    assert parts[0] == "Here are options:\n"
+    assert [part.strip() for part in parts[1:]] == ["Use Python", "Use Go", "Use Rust"]
+
+def test_option_split_ignores_inline_mentions():
+    text = "This option 1 is mentioned inline only"
+    
+    assert _OPTION_SPLIT_RE.split(text) == [text]
\ No newline at end of file